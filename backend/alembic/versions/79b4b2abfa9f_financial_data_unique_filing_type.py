@@ -0,0 +1,50 @@
+"""Add filing_type to _financial_data_unique
+
+Revision ID: 79b4b2abfa9f
+Revises: af60973ac558
+Create Date: 2026-10-18 23:05:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '79b4b2abfa9f'
+down_revision = 'af60973ac558'
+branch_labels = None
+depends_on = None
+
+OLD_COLUMNS = ['symbol', 'filing_date', 'statement_type', 'metric_name', 'period_end']
+NEW_COLUMNS = ['symbol', 'filing_type', 'filing_date', 'statement_type', 'metric_name', 'period_end']
+
+
+def _replace_constraint(columns) -> None:
+    if op.get_bind().dialect.name == 'postgresql':
+        # Build the new index without blocking writes, then swap it in; the
+        # constraint takes over the index (and its name) with no second build
+        with op.get_context().autocommit_block():
+            op.drop_index('_financial_data_unique_new', table_name='financial_data',
+                          if_exists=True, postgresql_concurrently=True)
+            op.create_index('_financial_data_unique_new', 'financial_data', columns,
+                            unique=True, postgresql_concurrently=True)
+        op.drop_constraint('_financial_data_unique', 'financial_data', type_='unique')
+        op.execute(
+            'ALTER TABLE financial_data ADD CONSTRAINT _financial_data_unique '
+            'UNIQUE USING INDEX _financial_data_unique_new'
+        )
+    else:
+        with op.batch_alter_table('financial_data') as batch_op:
+            batch_op.drop_constraint('_financial_data_unique', type_='unique')
+            batch_op.create_unique_constraint('_financial_data_unique', columns)
+
+
+def upgrade() -> None:
+    # Every existing row already satisfies the wider key, so this cannot fail
+    _replace_constraint(NEW_COLUMNS)
+
+
+def downgrade() -> None:
+    # Fails if a fiscal Q4 and its fiscal year were stored under the same
+    # filing_date and period_end; delete the Q4 (10-Q) rows first
+    _replace_constraint(OLD_COLUMNS)
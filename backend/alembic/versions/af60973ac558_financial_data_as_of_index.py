@@ -0,0 +1,59 @@
+"""Build the financial_data as-of index concurrently
+
+Revision ID: af60973ac558
+Revises:
+Create Date: 2026-10-18 22:40:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'af60973ac558'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def _drop_invalid_index(name: str) -> None:
+    # An interrupted CREATE INDEX CONCURRENTLY leaves an invalid index behind,
+    # which IF NOT EXISTS would otherwise keep forever
+    invalid = op.get_bind().execute(sa.text(
+        "SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+        "WHERE c.relname = :name AND NOT i.indisvalid"
+    ), {"name": name}).first()
+    if invalid:
+        op.drop_index(name, table_name='financial_data', postgresql_concurrently=True)
+
+
+def upgrade() -> None:
+    # CONCURRENTLY cannot run in a transaction; it keeps financial_data
+    # writable on PostgreSQL while the index builds
+    with op.get_context().autocommit_block():
+        if op.get_bind().dialect.name == 'postgresql':
+            _drop_invalid_index('ix_financial_data_as_of')
+        op.create_index(
+            'ix_financial_data_as_of',
+            'financial_data',
+            ['symbol', 'filing_type', 'statement_type', 'metric_name', 'period_end', 'filing_date'],
+            if_not_exists=True,
+            postgresql_concurrently=True,
+        )
+        # Superseded by ix_financial_data_as_of; only exists where it was built at startup
+        op.drop_index(
+            'ix_financial_data_symbol_type_metric_period',
+            table_name='financial_data',
+            if_exists=True,
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_financial_data_as_of',
+            table_name='financial_data',
+            if_exists=True,
+            postgresql_concurrently=True,
+        )
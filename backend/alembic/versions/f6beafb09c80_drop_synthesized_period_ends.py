@@ -0,0 +1,131 @@
+"""Delete financial_data rows stored with synthesized period ends
+
+Revision ID: f6beafb09c80
+Revises: 79b4b2abfa9f
+Create Date: 2026-10-18 23:30:00.000000
+
+Before fiscal period ends were resolved from filings, every FY label was
+stored as Dec 31 and every Qn label as the last day of calendar quarter n,
+and rows were matched to filings by calendar year/quarter. For companies
+whose fiscal periods don't end on calendar quarter ends, those rows carry
+the wrong period_end (and often the wrong filing_date), and re-extraction
+adds correctly dated rows next to them instead of replacing them.
+
+This deletes them, along with any row filed before its period ended, and
+resets the affected symbols' financials checkpoint so backfill.py
+re-extracts them. Their version history is not recoverable: the stored
+filing dates were never reliable.
+"""
+import calendar
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f6beafb09c80'
+down_revision = '79b4b2abfa9f'
+branch_labels = None
+depends_on = None
+
+filings = {
+    form: sa.table(name, sa.column('symbol', sa.String), sa.column('period_of_report', sa.Date))
+    for form, name in (('10-K', 'filings_10k'), ('10-Q', 'filings_10q'))
+}
+financial_data = sa.table(
+    'financial_data',
+    sa.column('symbol', sa.String),
+    sa.column('filing_type', sa.String),
+    sa.column('filing_date', sa.Date),
+    sa.column('period_end', sa.Date),
+)
+symbol_coverage = sa.table(
+    'symbol_coverage',
+    sa.column('symbol', sa.String),
+    sa.column('financial_rows_10k', sa.Integer),
+    sa.column('financial_rows_10q', sa.Integer),
+    sa.column('first_period_10k', sa.Date),
+    sa.column('last_period_10k', sa.Date),
+    sa.column('first_period_10q', sa.Date),
+    sa.column('last_period_10q', sa.Date),
+)
+backfill_state = sa.table(
+    'backfill_state',
+    sa.column('symbol', sa.String),
+    sa.column('status', sa.String),
+    sa.column('financials_extracted_at', sa.DateTime),
+    sa.column('metrics_added', sa.Integer),
+)
+
+
+def _is_calendar_quarter_end(day) -> bool:
+    # The only dates the old label parser produced
+    return day.month % 3 == 0 and day.day == calendar.monthrange(day.year, day.month)[1]
+
+
+def _refresh_coverage(bind, symbol: str) -> None:
+    stats = {
+        filing_type: (count, first_period, last_period)
+        for filing_type, count, first_period, last_period in bind.execute(
+            sa.select(
+                financial_data.c.filing_type,
+                sa.func.count(),
+                sa.func.min(financial_data.c.period_end),
+                sa.func.max(financial_data.c.period_end),
+            ).where(financial_data.c.symbol == symbol).group_by(financial_data.c.filing_type)
+        )
+    }
+    annual = stats.get('10-K', (0, None, None))
+    quarterly = stats.get('10-Q', (0, None, None))
+    bind.execute(symbol_coverage.update().where(symbol_coverage.c.symbol == symbol).values(
+        financial_rows_10k=annual[0], first_period_10k=annual[1], last_period_10k=annual[2],
+        financial_rows_10q=quarterly[0], first_period_10q=quarterly[1], last_period_10q=quarterly[2],
+    ))
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+
+    reported = {}
+    for form, table in filings.items():
+        for symbol, period_of_report in bind.execute(
+            sa.select(table.c.symbol, table.c.period_of_report).where(table.c.period_of_report.isnot(None))
+        ):
+            reported.setdefault(symbol, []).append((form, period_of_report))
+
+    redo = []
+    for symbol, periods in sorted(reported.items()):
+        annual_months = [period.month for form, period in periods if form == '10-K']
+        fye_month = max(set(annual_months), key=annual_months.count) if annual_months else 12
+
+        # A value can't be filed before its period ends
+        conditions = [financial_data.c.filing_date < financial_data.c.period_end]
+        if fye_month != 12 or not all(_is_calendar_quarter_end(period) for _, period in periods):
+            # Real period ends differ from the synthesized ones, so every stored
+            # calendar quarter end is a synthesized date (for a June or March
+            # fiscal year, real ones too: re-extraction restores those)
+            stored = bind.execute(
+                sa.select(financial_data.c.period_end).distinct().where(financial_data.c.symbol == symbol)
+            ).scalars()
+            synthesized = [period_end for period_end in stored if period_end and _is_calendar_quarter_end(period_end)]
+            if synthesized:
+                conditions.append(financial_data.c.period_end.in_(synthesized))
+
+        deleted = bind.execute(
+            financial_data.delete().where(financial_data.c.symbol == symbol, sa.or_(*conditions))
+        ).rowcount
+        if deleted:
+            print(f"{symbol}: deleted {deleted} financial_data rows with synthesized period ends")
+            _refresh_coverage(bind, symbol)
+            redo.append(symbol)
+
+    if redo:
+        bind.execute(backfill_state.update().where(backfill_state.c.symbol.in_(redo)).values(
+            status='pending', financials_extracted_at=None, metrics_added=None,
+        ))
+        print(f"Re-extract with: python backfill.py --symbols {','.join(redo)}")
+
+
+def downgrade() -> None:
+    # The deleted rows were wrong and are not restored
+    pass
@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+"""
+Backfill SEC filings and financial data for many symbols on a process pool.
+
+Each symbol runs filing sync and then financial extraction inside a worker
+process with its own DB engine. Progress is checkpointed per symbol and per
+stage in the backfill_state table, so re-running the same command after a
+crash or Ctrl-C resumes where it stopped.
+
+Usage:
+    python backfill.py --symbols AAPL,MSFT,GOOGL
+    python backfill.py --file tickers.txt --workers 8
+    python backfill.py --all --report backfill_report.json
+    python backfill.py --rebuild-coverage
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import urllib.request
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy.orm import sessionmaker
+from database import DATABASE_URL, BackfillState, SessionLocal, create_db_engine, engine, engine_options
+import services.filing_service as filing_service
+import services.coverage_service as coverage_service
+import services.financial_service as financial_service
+
+SEC_TICKERS_URL = "https://www.sec.gov/files/company_tickers.json"
+SEC_USER_AGENT = "SignalRefinery Admin user@example.com"
+
+STAGES = ("filings", "financials")
+
+# Session factory bound to the worker's own engine, set up by _init_worker
+_WorkerSession = None
+
+
+def load_sec_tickers():
+    """Download the full SEC ticker map and return its symbols."""
+    request = urllib.request.Request(SEC_TICKERS_URL, headers={"User-Agent": SEC_USER_AGENT})
+    with urllib.request.urlopen(request, timeout=30) as response:
+        data = json.load(response)
+    return sorted({entry["ticker"].upper() for entry in data.values()})
+
+
+def load_symbols(args):
+    """Resolve the symbol universe from --symbols, --file or --all, de-duplicated in order."""
+    if args.all:
+        symbols = load_sec_tickers()
+    elif args.file:
+        with open(args.file) as f:
+            symbols = [line.strip() for line in f if line.strip() and not line.startswith("#")]
+    else:
+        symbols = args.symbols.split(",")
+
+    seen = set()
+    ordered = []
+    for symbol in symbols:
+        symbol = symbol.strip().upper()
+        if symbol and symbol not in seen:
+            seen.add(symbol)
+            ordered.append(symbol)
+    return ordered
+
+
+def _init_worker():
+    """Give each worker process its own engine instead of inheriting the parent's pool."""
+    global _WorkerSession
+    options = {**engine_options("write", DATABASE_URL), "pool_size": 1, "max_overflow": 0}
+    worker_engine = create_db_engine(DATABASE_URL, **options)
+    _WorkerSession = sessionmaker(autocommit=False, autoflush=False, bind=worker_engine)
+
+
+def _check_result(result):
+    if isinstance(result, dict) and "error" in result:
+        raise RuntimeError(result["error"])
+    return result
+
+
+def backfill_symbol(symbol: str):
+    """
+    Run every stage that has not been checkpointed yet for one symbol.
+
+    Returns a plain dict (it crosses the process boundary) with the outcome and
+    the seconds spent in each stage during this run; skipped stages report None.
+    """
+    db = _WorkerSession()
+    timings = {stage: None for stage in STAGES}
+    stage = STAGES[0]
+    try:
+        state = db.query(BackfillState).filter_by(symbol=symbol).first()
+        if state is None:
+            state = BackfillState(symbol=symbol, attempts=0)
+            db.add(state)
+        state.status = "pending"
+        state.attempts = (state.attempts or 0) + 1
+        state.failed_stage = None
+        state.error = None
+        db.commit()
+
+        try:
+            if state.filings_synced_at is None:
+                started = time.perf_counter()
+                _check_result(filing_service.fetch_and_store_filings(symbol, db))
+                timings["filings"] = time.perf_counter() - started
+                state.filings_seconds = timings["filings"]
+                state.filings_synced_at = datetime.now()
+                db.commit()
+
+            stage = "financials"
+            if state.financials_extracted_at is None:
+                started = time.perf_counter()
+                result = _check_result(financial_service.extract_and_store_financials(symbol, db))
+                timings["financials"] = time.perf_counter() - started
+                state.financials_seconds = timings["financials"]
+                state.financials_extracted_at = datetime.now()
+                state.metrics_added = result["metrics_added"]
+
+            state.status = "done"
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            state.status = "failed"
+            state.failed_stage = stage
+            state.error = str(e)[:1000]
+            db.commit()
+
+        return {
+            "symbol": symbol,
+            "status": state.status,
+            "failed_stage": state.failed_stage,
+            "error": state.error,
+            "metrics_added": state.metrics_added,
+            "timings": timings,
+        }
+    finally:
+        db.close()
+
+
+def _stage_stats(results, stage):
+    seconds = [r["timings"][stage] for r in results if r["timings"].get(stage) is not None]
+    if not seconds:
+        return {"count": 0, "total_seconds": 0.0, "mean_seconds": None, "max_seconds": None}
+    return {
+        "count": len(seconds),
+        "total_seconds": round(sum(seconds), 3),
+        "mean_seconds": round(sum(seconds) / len(seconds), 3),
+        "max_seconds": round(max(seconds), 3),
+    }
+
+
+def build_report(requested, skipped, results, elapsed, interrupted):
+    succeeded = [r for r in results if r["status"] == "done"]
+    failed = [r for r in results if r["status"] != "done"]
+    return {
+        "requested": requested,
+        "skipped": skipped,
+        "processed": len(results),
+        "succeeded": len(succeeded),
+        "failed": len(failed),
+        "interrupted": interrupted,
+        "elapsed_seconds": round(elapsed, 3),
+        "symbols_per_minute": round(len(results) / elapsed * 60, 2) if elapsed > 0 else None,
+        "metrics_added": sum(r["metrics_added"] or 0 for r in succeeded),
+        "stages": {stage: _stage_stats(results, stage) for stage in STAGES},
+        "failures": [
+            {"symbol": r["symbol"], "stage": r["failed_stage"], "error": r["error"]}
+            for r in failed
+        ],
+    }
+
+
+def _seconds(value):
+    return "-" if value is None else f"{value}s"
+
+
+def print_report(report):
+    print("\n========== BACKFILL SUMMARY ==========")
+    print(f"Requested:       {report['requested']}")
+    print(f"Skipped:         {report['skipped']}")
+    print(f"Processed:       {report['processed']}")
+    print(f"Succeeded:       {report['succeeded']}")
+    print(f"Failed:          {report['failed']}")
+    print(f"Elapsed:         {report['elapsed_seconds']}s")
+    print(f"Throughput:      {report['symbols_per_minute']} symbols/min")
+    print(f"Metrics added:   {report['metrics_added']}")
+    for stage, stats in report["stages"].items():
+        print(
+            f"Stage {stage:<10} runs={stats['count']} total={_seconds(stats['total_seconds'])} "
+            f"mean={_seconds(stats['mean_seconds'])} max={_seconds(stats['max_seconds'])}"
+        )
+    for failure in report["failures"]:
+        print(f"  FAILED {failure['symbol']} at {failure['stage']}: {failure['error']}")
+    if report["interrupted"]:
+        print("Run was interrupted; re-run the same command to resume.")
+
+
+def run_backfill(symbols, workers, max_tasks_per_child=None):
+    """Fan symbols out one task each, so a slow company only occupies its own worker."""
+    results = []
+    interrupted = False
+    executor = ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_worker,
+        max_tasks_per_child=max_tasks_per_child,
+    )
+    try:
+        futures = {executor.submit(backfill_symbol, symbol): symbol for symbol in symbols}
+        for completed, future in enumerate(as_completed(futures), start=1):
+            symbol = futures[future]
+            try:
+                result = future.result()
+            except BrokenProcessPool:
+                raise
+            except Exception as e:
+                result = {
+                    "symbol": symbol,
+                    "status": "failed",
+                    "failed_stage": None,
+                    "error": str(e),
+                    "metrics_added": None,
+                    "timings": {stage: None for stage in STAGES},
+                }
+            results.append(result)
+            timing = ", ".join(
+                f"{stage} {seconds:.1f}s"
+                for stage, seconds in result["timings"].items()
+                if seconds is not None
+            )
+            print(f"[{completed}/{len(symbols)}] {symbol}: {result['status']}" + (f" ({timing})" if timing else ""))
+    except (KeyboardInterrupt, BrokenProcessPool) as e:
+        interrupted = True
+        print(f"\nStopping backfill: {type(e).__name__}")
+        executor.shutdown(wait=False, cancel_futures=True)
+    else:
+        executor.shutdown(wait=True)
+    return results, interrupted
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Backfill SEC filings and financial data.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--rebuild-coverage", action="store_true",
+                        help="Rebuild symbol_coverage from the stored data and exit")
+    source.add_argument("--symbols", help="Comma-separated ticker list, e.g. AAPL,MSFT")
+    source.add_argument("--file", help="File with one ticker per line")
+    source.add_argument("--all", action="store_true", help="Every ticker in the SEC ticker map")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="Number of worker processes (default: CPU count)")
+    parser.add_argument("--max-tasks-per-child", type=int, default=None,
+                        help="Recycle a worker process after this many symbols")
+    parser.add_argument("--retry-failed", action="store_true",
+                        help="Also re-run symbols whose last attempt failed")
+    parser.add_argument("--restart", action="store_true",
+                        help="Discard checkpoints for the selected symbols and start over")
+    parser.add_argument("--report", help="Write the summary report as JSON to this path")
+    args = parser.parse_args(argv)
+
+    if args.rebuild_coverage:
+        db = SessionLocal()
+        try:
+            print(f"Rebuilt coverage for {coverage_service.refresh_all_coverage(db)} symbols")
+        finally:
+            db.close()
+        return 0
+
+    symbols = load_symbols(args)
+
+    db = SessionLocal()
+    try:
+        if args.restart:
+            db.query(BackfillState).filter(BackfillState.symbol.in_(symbols)).delete(synchronize_session=False)
+            db.commit()
+        states = dict(db.query(BackfillState.symbol, BackfillState.status).all())
+    finally:
+        db.close()
+
+    skip_statuses = {"done"} if args.retry_failed else {"done", "failed"}
+    pending = [s for s in symbols if states.get(s) not in skip_statuses]
+    print(f"Backfilling {len(pending)} of {len(symbols)} symbols with {args.workers} workers")
+
+    # Workers build their own engines; don't hand them the parent's open connections
+    engine.dispose()
+
+    started = time.perf_counter()
+    results, interrupted = run_backfill(pending, args.workers, args.max_tasks_per_child)
+    report = build_report(len(symbols), len(symbols) - len(pending), results, time.perf_counter() - started, interrupted)
+
+    print_report(report)
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=2)
+
+    return 1 if report["failed"] or interrupted else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,8 +1,13 @@
-from sqlalchemy import create_engine, Column, Integer, String, Date, DateTime, UniqueConstraint, Float
+from sqlalchemy import create_engine, inspect, Column, Integer, String, Date, DateTime, UniqueConstraint, Float, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from fastapi import Request, Response
+from collections import deque
 from datetime import datetime
+import math
 import os
+import threading
+import time
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -12,17 +17,106 @@ DATABASE_URL = os.getenv(
     "DATABASE_URL",
     "sqlite:///./tickers.db"
 )
+# Read replica for GET routes; defaults to the primary when no replica is configured
+DATABASE_READ_URL = os.getenv("DATABASE_READ_URL") or DATABASE_URL
 
-# Ensure the database URL is in the correct format for SQLAlchemy
-if DATABASE_URL.startswith("postgresql://"):
-    DATABASE_URL = DATABASE_URL.replace("postgresql://", "postgresql+psycopg2://", 1)
+def _sqlalchemy_url(url: str):
+    # Ensure the database URL is in the correct format for SQLAlchemy
+    if url.startswith("postgresql://"):
+        return url.replace("postgresql://", "postgresql+psycopg2://", 1)
+    return url
 
-engine = create_engine(
-    DATABASE_URL,
-    pool_pre_ping=True,  # Verify connections before using them
-    pool_recycle=3600,   # Recycle connections after 1 hour
-)
+DATABASE_URL = _sqlalchemy_url(DATABASE_URL)
+DATABASE_READ_URL = _sqlalchemy_url(DATABASE_READ_URL)
+
+# Seconds after a write during which the same client keeps reading from the primary,
+# so it sees its own writes even while the replica lags
+READ_YOUR_WRITES_SECONDS = float(os.getenv("DB_READ_YOUR_WRITES_SECONDS", "10"))
+LAST_WRITE_COOKIE = "sr_last_write"
+READ_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+def engine_options(role: str, url: str):
+    """
+    Pool and timeout settings for the 'write' or 'read' engine, from env vars
+    DB_<ROLE>_POOL_SIZE, DB_<ROLE>_MAX_OVERFLOW, DB_<ROLE>_POOL_TIMEOUT and
+    DB_<ROLE>_STATEMENT_TIMEOUT_MS (0 disables the statement timeout).
+
+    SQLite keeps SQLAlchemy's defaults since it has no server-side pool or timeouts.
+    """
+    if url.startswith("sqlite"):
+        return {}
+
+    prefix = f"DB_{role.upper()}"
+    defaults = {
+        "write": {"POOL_SIZE": 5, "MAX_OVERFLOW": 5, "POOL_TIMEOUT": 30, "STATEMENT_TIMEOUT_MS": 0},
+        "read": {"POOL_SIZE": 10, "MAX_OVERFLOW": 10, "POOL_TIMEOUT": 10, "STATEMENT_TIMEOUT_MS": 30000},
+    }[role]
+    setting = {key: int(os.getenv(f"{prefix}_{key}", default)) for key, default in defaults.items()}
+
+    options = {
+        "pool_size": setting["POOL_SIZE"],
+        "max_overflow": setting["MAX_OVERFLOW"],
+        "pool_timeout": setting["POOL_TIMEOUT"],
+    }
+    if setting["STATEMENT_TIMEOUT_MS"]:
+        options["connect_args"] = {"options": f"-c statement_timeout={setting['STATEMENT_TIMEOUT_MS']}"}
+    return options
+
+def create_db_engine(url: str = None, **pool_options):
+    """Create an engine for DATABASE_URL (or url); backfill workers use this to get their own pool."""
+    return create_engine(
+        url or DATABASE_URL,
+        pool_pre_ping=True,  # Verify connections before using them
+        pool_recycle=3600,   # Recycle connections after 1 hour
+        **pool_options,
+    )
+
+class PoolWaitStats:
+    """Running record of how long requests waited to check a connection out of a pool."""
+
+    def __init__(self, window: int = 1000):
+        self._lock = threading.Lock()
+        self._recent = deque(maxlen=window)
+        self.checkouts = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+    def record(self, seconds: float):
+        with self._lock:
+            self._recent.append(seconds)
+            self.checkouts += 1
+            self.total_seconds += seconds
+            self.max_seconds = max(self.max_seconds, seconds)
+
+    def snapshot(self):
+        with self._lock:
+            recent = sorted(self._recent)
+            checkouts, total, maximum = self.checkouts, self.total_seconds, self.max_seconds
+
+        def percentile(fraction):
+            return round(recent[int(fraction * (len(recent) - 1))] * 1000, 3) if recent else None
+
+        return {
+            "checkouts": checkouts,
+            "mean_wait_ms": round(total / checkouts * 1000, 3) if checkouts else None,
+            "max_wait_ms": round(maximum * 1000, 3),
+            "p50_wait_ms": percentile(0.5),
+            "p95_wait_ms": percentile(0.95),
+            "p99_wait_ms": percentile(0.99),
+        }
+
+# Primary (write) engine; also used for table creation, migrations and scripts
+engine = create_db_engine(DATABASE_URL, **engine_options("write", DATABASE_URL))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# Read engine with its own pool, so dashboard reads never queue behind extract writes
+read_engine = create_db_engine(DATABASE_READ_URL, **engine_options("read", DATABASE_READ_URL))
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+
+engines = {"write": engine, "read": read_engine}
+pool_wait_stats = {"write": PoolWaitStats(), "read": PoolWaitStats()}
+_session_factories = {"write": SessionLocal, "read": ReadSessionLocal}
+
 Base = declarative_base()
 
 class Filing10K(Base):
@@ -75,14 +169,108 @@ class FinancialData(Base):
     extracted_date = Column(DateTime, default=datetime.now)
 
     __table_args__ = (
-        UniqueConstraint('symbol', 'filing_date', 'statement_type', 'metric_name', 'period_end', name='_financial_data_unique'),
+        # filing_type is part of the key: a fiscal Q4 (10-Q series) and its fiscal year
+        # (10-K series) share the 10-K's filing_date and period_end
+        UniqueConstraint('symbol', 'filing_type', 'filing_date', 'statement_type', 'metric_name', 'period_end', name='_financial_data_unique'),
+        # Rows are append-only versions keyed by source filing_date; this index serves
+        # "latest version known as of a date" lookups per series, including the
+        # multi-symbol /compare reads
+        Index('ix_financial_data_as_of', 'symbol', 'filing_type', 'statement_type', 'metric_name', 'period_end', 'filing_date'),
     )
 
+class SymbolCoverage(Base):
+    """Per-symbol summary of what is stored, refreshed by the filing and financial writers."""
+    __tablename__ = "symbol_coverage"
+
+    id = Column(Integer, primary_key=True, index=True)
+    symbol = Column(String, unique=True, index=True)
+
+    filings_10k = Column(Integer, default=0)
+    filings_10q = Column(Integer, default=0)
+    last_filing_date = Column(Date, nullable=True, index=True)
+
+    financial_rows_10k = Column(Integer, default=0)
+    financial_rows_10q = Column(Integer, default=0)
+    first_period_10k = Column(Date, nullable=True)
+    last_period_10k = Column(Date, nullable=True)
+    first_period_10q = Column(Date, nullable=True)
+    last_period_10q = Column(Date, nullable=True)
+    last_extracted_at = Column(DateTime, nullable=True, index=True)
+
+    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
+
+class BackfillState(Base):
+    __tablename__ = "backfill_state"
+
+    id = Column(Integer, primary_key=True, index=True)
+    symbol = Column(String, unique=True, index=True)
+    status = Column(String, index=True)  # pending, done or failed
+    failed_stage = Column(String, nullable=True)
+    error = Column(String, nullable=True)
+    attempts = Column(Integer, default=0)
+
+    # Per-stage checkpoints; a stage with a timestamp is skipped on resume
+    filings_synced_at = Column(DateTime, nullable=True)
+    financials_extracted_at = Column(DateTime, nullable=True)
+    filings_seconds = Column(Float, nullable=True)
+    financials_seconds = Column(Float, nullable=True)
+    metrics_added = Column(Integer, nullable=True)
+
+    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
+
+def _stamp_new_database():
+    """
+    Mark a database just created from the models as current for Alembic.
+
+    create_all already builds the latest schema, so `alembic upgrade head` must
+    only apply revisions written after this point; existing databases are
+    brought up to date by running the migrations instead.
+    """
+    from alembic.runtime.migration import MigrationContext
+    from alembic.script import ScriptDirectory
+
+    scripts = ScriptDirectory(os.path.join(os.path.dirname(os.path.abspath(__file__)), "alembic"))
+    with engine.begin() as connection:
+        MigrationContext.configure(connection).stamp(scripts, "head")
+
+_new_database = not inspect(engine).has_table(FinancialData.__tablename__)
 Base.metadata.create_all(bind=engine)
+if _new_database:
+    _stamp_new_database()
+
+def _wrote_recently(request: Request):
+    last_write = request.cookies.get(LAST_WRITE_COOKIE)
+    try:
+        return time.time() - float(last_write) < READ_YOUR_WRITES_SECONDS
+    except (TypeError, ValueError):
+        return False
+
+def get_db(request: Request, response: Response):
+    """
+    Yield a session on the read engine for GET/HEAD/OPTIONS requests and on the
+    write engine otherwise.
+
+    Write requests set a short-lived cookie; while it is fresh the same client's
+    reads go to the primary too, so it never reads older data than it just wrote.
+    """
+    if request.method in READ_METHODS:
+        role = "write" if _wrote_recently(request) else "read"
+    else:
+        role = "write"
+        response.set_cookie(
+            LAST_WRITE_COOKIE,
+            str(time.time()),
+            max_age=max(1, math.ceil(READ_YOUR_WRITES_SECONDS)),
+            httponly=True,
+        )
 
-def get_db():
-    db = SessionLocal()
+    db = _session_factories[role]()
     try:
+        # Check the connection out up front so pool wait time is measured here
+        # rather than hidden inside the route's first query
+        started = time.perf_counter()
+        db.connection()
+        pool_wait_stats[role].record(time.perf_counter() - started)
         yield db
     finally:
         db.close()
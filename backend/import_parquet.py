@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+Bulk-load Parquet files into financial_data.
+
+Files use the layout produced by GET /financials.parquet; rows already in the
+database are skipped. Each file is loaded in one transaction.
+
+Usage:
+    python import_parquet.py financials.parquet [more.parquet ...] [--batch-size 50000]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from database import SessionLocal
+import services.arrow_service as arrow_service
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load Parquet files into financial_data.")
+    parser.add_argument("paths", nargs="+", help="Parquet files to import")
+    parser.add_argument("--batch-size", type=int, default=50_000, help="Rows per insert batch")
+    args = parser.parse_args(argv)
+
+    db = SessionLocal()
+    try:
+        for path in args.paths:
+            started = time.perf_counter()
+            result = arrow_service.import_parquet(path, db, batch_size=args.batch_size)
+            print(
+                f"{path}: {result['rows_read']} rows in {result['batches']} batches, "
+                f"{result['rows_inserted']} new for {result['symbols']} symbols ({time.perf_counter() - started:.2f}s)"
+            )
+    finally:
+        db.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
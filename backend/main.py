@@ -1,8 +1,9 @@
+import os
 from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse
 from fastapi.middleware.cors import CORSMiddleware
-from routers import filings, financials, health
+from routers import coverage, filings, financials, health
 from database import engine, Base
 
 # Create tables if they don't exist
@@ -14,10 +15,13 @@ app = FastAPI(
     version="1.0.0"
 )
 
-# Enable CORS for frontend communication
+# Enable CORS for frontend communication. Origins are listed explicitly because the
+# frontend sends credentials (the read-your-writes cookie), which a "*" origin rejects.
+CORS_ORIGINS = os.getenv("CORS_ORIGINS", "http://localhost:3000,http://127.0.0.1:3000")
+
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],  # Configure more restrictively in production
+    allow_origins=[origin.strip() for origin in CORS_ORIGINS.split(",") if origin.strip()],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
@@ -26,6 +30,7 @@ app.add_middleware(
 app.include_router(health.router)
 app.include_router(filings.router)
 app.include_router(financials.router)
+app.include_router(coverage.router)
 
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
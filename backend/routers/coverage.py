@@ -0,0 +1,36 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+from database import SymbolCoverage, get_db
+import services.coverage_service as coverage_service
+
+router = APIRouter()
+
+@router.get("/coverage")
+async def get_coverage(
+    symbols: str = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Summarize which symbols have data, which periods they cover and how fresh they are.
+
+    Reads the symbol_coverage table maintained by the filing and financial writers,
+    so this never scans financial_data.
+
+    Args:
+        symbols: Optional comma-separated ticker symbols to restrict the result to
+    """
+    try:
+        query = db.query(SymbolCoverage)
+        if symbols:
+            symbol_list = [s.strip() for s in symbols.split(",") if s.strip()]
+            query = query.filter(SymbolCoverage.symbol.in_(symbol_list))
+
+        rows = query.order_by(SymbolCoverage.symbol).all()
+
+        return {
+            "count": len(rows),
+            "coverage": [coverage_service.coverage_to_dict(row) for row in rows]
+        }
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error retrieving coverage: {str(e)}")
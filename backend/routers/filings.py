@@ -1,6 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
-from database import get_db
+from database import Filing10K, Filing10Q, get_db
+import services.document_service as document_service
 import services.filing_service as filing_service
 
 router = APIRouter()
@@ -14,4 +15,46 @@ async def fetch_filings(symbol: str, db: Session = Depends(get_db)):
 
 @router.get("/filings/{symbol}")
 async def get_filings(symbol: str, db: Session = Depends(get_db)):
-    return filing_service.get_filings_by_symbol(symbol, db)
\ No newline at end of file
+    return filing_service.get_filings_by_symbol(symbol, db)
+
+def _get_filing(symbol: str, filing_id: int, form: str, db: Session):
+    models = {"10-K": Filing10K, "10-Q": Filing10Q}
+    if form not in models:
+        raise HTTPException(status_code=400, detail="form must be '10-K' or '10-Q'. Default is '10-K'.")
+    filing = db.query(models[form]).filter_by(symbol=symbol, id=filing_id).first()
+    if not filing:
+        raise HTTPException(status_code=404, detail=f"No {form} filing {filing_id} found for {symbol}")
+    # Only the loaded columns are needed from here on; return the connection to
+    # the pool instead of holding it through a document download
+    db.close()
+    return filing
+
+# The section routes are plain def so FastAPI runs them in its threadpool: the
+# first read of a filing downloads it from SEC, which would block the event loop.
+
+@router.get("/filings/{symbol}/{filing_id}/sections")
+def list_filing_sections(symbol: str, filing_id: int, form: str = "10-K", db: Session = Depends(get_db)):
+    """
+    List the sections indexed in a filing's primary document with their sizes in bytes.
+    The document is downloaded from SEC once and then served from the local store.
+    """
+    filing = _get_filing(symbol, filing_id, form, db)
+    try:
+        return document_service.list_sections(filing, form)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error reading filing document: {str(e)}")
+
+@router.get("/filings/{symbol}/{filing_id}/sections/{item}")
+def get_filing_section(symbol: str, filing_id: int, item: str, form: str = "10-K", db: Session = Depends(get_db)):
+    """
+    Get the text of one section, e.g. item '1A' (risk factors) or '7' (MD&A) of a 10-K.
+    10-Q sections are keyed by part ('I-2', 'II-1A'); an unqualified item resolves to Part I.
+    """
+    filing = _get_filing(symbol, filing_id, form, db)
+    try:
+        result = document_service.get_section(filing, form, item)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error reading filing document: {str(e)}")
+    if "error" in result:
+        raise HTTPException(status_code=404, detail=result["error"])
+    return result
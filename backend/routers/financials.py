@@ -1,312 +1,121 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response
+from datetime import date
 from sqlalchemy.orm import Session
-from sqlalchemy.exc import IntegrityError
-from database import FinancialData, Filing10K, Filing10Q, get_db
-from edgar import Company, set_identity
-from datetime import datetime, date
-from typing import List, Dict, Any
+from database import FinancialData, get_db
+import services.arrow_service as arrow_service
+import services.financial_service as financial_service
 
 router = APIRouter()
 
-# Set SEC identity for edgar library
-set_identity("SignalRefinery Admin user@example.com")
+# Upper bound on /compare fan-out so one request stays a bounded index scan
+MAX_COMPARE_SYMBOLS = 50
 
-def parse_period_label(period_label: str):
+@router.post("/financials/extract/{symbol}")
+async def extract_and_store_financials(symbol: str, db: Session = Depends(get_db)):
     """
-    Parse period label like 'FY 2025' or 'Q1 2026' to approximate period end date.
-
-    Args:
-        period_label: Period string from EDGAR (e.g., 'FY 2025', 'Q1 2026')
-
-    Returns:
-        Approximate period end date as a date object
+    Extract financial data from latest 10-K/10-Q filing for a given ticker symbol.
     """
-    import re
-
-    # Match "FY YYYY" pattern for annual periods
-    fy_match = re.match(r'FY (\d{4})', period_label)
-    if fy_match:
-        year = int(fy_match.group(1))
-        # Use Dec 31 as fiscal year end (most common)
-        return date(year, 12, 31)
-
-    # Match "Q# YYYY" pattern for quarterly periods
-    q_match = re.match(r'Q(\d) (\d{4})', period_label)
-    if q_match:
-        quarter = int(q_match.group(1))
-        year = int(q_match.group(2))
-
-        # Standard calendar quarters
-        quarter_end_months = {1: 3, 2: 6, 3: 9, 4: 12}
-        month = quarter_end_months[quarter]
-
-        # Last day of quarter
-        last_day = 31 if month in [3, 12] else 30
-
-        return date(year, month, last_day)
+    try:
+        result = financial_service.extract_and_store_financials(symbol, db)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error extracting financials: {str(e)}")
 
-    # Fallback to current date if parsing fails
-    return date.today()
+    if "error" in result:
+        raise HTTPException(status_code=404, detail=result["error"])
+    return result
 
-def extract_financials_from_company(symbol: str, company_name: str, cik: str):
+@router.get("/financials/{symbol}.arrow")
+async def get_financials_arrow(
+    symbol: str,
+    statement_type: str = None,
+    as_of: date = None,
+    db: Session = Depends(get_db)
+):
     """
-    Extract real financial statements from EDGAR using the edgar library.
-    Retrieves 5 years of annual (10-K) and quarterly (10-Q) data for:
-    Income Statement, Balance Sheet, and Cash Flow data.
+    Retrieve stored financial data for a ticker symbol as an Apache Arrow IPC stream.
+    Same rows and statement_type/as_of filters as /financials/{symbol}, one row per value.
     """
     try:
-        from edgar import Company
-
-        # Create Company instance to get financial data
-        company = Company(symbol)
-
-        extracted_data = []
-
-        # ========== EXTRACT ANNUAL DATA (10-K) ==========
-        # Request 5 years of annual data
-        for statement_type, statement_method in [
-            ('income_statement', company.income_statement),
-            ('balance_sheet', company.balance_sheet),
-            ('cash_flow', company.cash_flow)
-        ]:
-            try:
-                # Get 5 years of annual data
-                statement = statement_method(periods=5, period='annual')
-
-                # Iterate over all items with values
-                for item in statement.iter_with_values():
-                    # Skip abstract items (headers/sections)
-                    if item.is_abstract:
-                        continue
-
-                    # Iterate over ALL periods (not just first one)
-                    if item.values:
-                        for period_label, value in item.values.items():
-                            if value is not None:
-                                try:
-                                    value_float = float(value)
-
-                                    # Parse period label to get period_end date
-                                    period_end = parse_period_label(period_label)
-
-                                    extracted_data.append({
-                                        'statement_type': statement_type,
-                                        'metric_name': item.concept,
-                                        'metric_label': item.label,
-                                        'value': value_float,
-                                        'period_label': period_label,
-                                        'period_end': period_end,
-                                        'filing_type': '10-K',
-                                    })
-                                except (ValueError, TypeError):
-                                    continue
-            except Exception as e:
-                print(f"Error extracting annual {statement_type}: {str(e)}")
-
-        # ========== EXTRACT QUARTERLY DATA (10-Q) ==========
-        # Request 20 quarters (5 years) of quarterly data
-        for statement_type, statement_method in [
-            ('income_statement', company.income_statement),
-            ('balance_sheet', company.balance_sheet),
-            ('cash_flow', company.cash_flow)
-        ]:
-            try:
-                # Get 20 quarters of quarterly data
-                statement = statement_method(periods=20, period='quarterly')
-
-                # Iterate over all items with values
-                for item in statement.iter_with_values():
-                    # Skip abstract items
-                    if item.is_abstract:
-                        continue
-
-                    # Iterate over ALL periods
-                    if item.values:
-                        for period_label, value in item.values.items():
-                            if value is not None:
-                                try:
-                                    value_float = float(value)
-
-                                    # Parse period label to get period_end date
-                                    period_end = parse_period_label(period_label)
-
-                                    extracted_data.append({
-                                        'statement_type': statement_type,
-                                        'metric_name': item.concept,
-                                        'metric_label': item.label,
-                                        'value': value_float,
-                                        'period_label': period_label,
-                                        'period_end': period_end,
-                                        'filing_type': '10-Q',
-                                    })
-                                except (ValueError, TypeError):
-                                    continue
-            except Exception as e:
-                print(f"Error extracting quarterly {statement_type}: {str(e)}")
-
-        if not extracted_data:
-            print(f"Warning: No financial data extracted for {symbol}")
-            return None
-
-        return extracted_data
+        table = arrow_service.query_table(
+            db, arrow_service.financial_data_select([symbol], statement_type, as_of=as_of)
+        )
 
+        if table.num_rows == 0:
+            raise HTTPException(status_code=404, detail=f"No financial data found for {symbol}")
+
+        return Response(content=arrow_service.to_arrow_ipc(table), media_type=arrow_service.ARROW_MEDIA_TYPE)
+
+    except HTTPException:
+        raise
     except Exception as e:
-        print(f"Error extracting financials: {str(e)}")
-        import traceback
-        traceback.print_exc()
-        return None
+        raise HTTPException(status_code=500, detail=f"Error exporting financials: {str(e)}")
 
-@router.post("/financials/extract/{symbol}")
-async def extract_and_store_financials(symbol: str, db: Session = Depends(get_db)):
+@router.get("/financials.parquet")
+async def export_financials_parquet(
+    symbols: str,
+    statement_type: str = None,
+    filing_type: str = None,
+    as_of: date = None,
+    all_versions: bool = False,
+    db: Session = Depends(get_db)
+):
     """
-    Extract financial data from latest 10-K/10-Q filing for a given ticker symbol.
+    Export stored financial data for several ticker symbols as one Parquet file.
+
+    Args:
+        symbols: Comma-separated ticker symbols (e.g., 'AAPL,MSFT')
+        statement_type: Optional income_statement, balance_sheet or cash_flow
+        filing_type: Optional '10-K' or '10-Q'
+        as_of: Optional date (YYYY-MM-DD); latest version filed on or before it
+        all_versions: Export every stored version instead of the latest per period
     """
     try:
-        # Check if filings exist for this symbol
-        filings_10k = db.query(Filing10K).filter_by(symbol=symbol).order_by(Filing10K.filing_date.desc()).all()
-        filings_10q = db.query(Filing10Q).filter_by(symbol=symbol).order_by(Filing10Q.filing_date.desc()).all()
+        symbol_list = list(dict.fromkeys(s.strip() for s in symbols.split(",") if s.strip()))
+        if not symbol_list:
+            raise HTTPException(status_code=400, detail="symbols must name at least one ticker")
 
-        if not filings_10k and not filings_10q:
-            raise HTTPException(
-                status_code=404,
-                detail=f"No filings found for {symbol}. Please fetch filings first using /fetch-filings/{symbol}"
+        table = arrow_service.query_table(
+            db, arrow_service.financial_data_select(
+                symbol_list, statement_type, filing_type, as_of=as_of, all_versions=all_versions
             )
+        )
 
-        # Get company name and CIK for XBRL extraction
-        import edgar as edgar_module
-        results = edgar_module.find_company(symbol)
+        if table.num_rows == 0:
+            raise HTTPException(status_code=404, detail=f"No financial data found for {', '.join(symbol_list)}")
 
-        if not results or len(results) == 0:
-            raise HTTPException(status_code=404, detail=f"Company with symbol '{symbol}' not found")
-
-        company = results[0]
-        company_name = company.name if hasattr(company, 'name') else str(company)
-        cik = str(company.cik) if hasattr(company, 'cik') else str(company._cik)
-
-        # Extract financial data
-        financial_data = extract_financials_from_company(symbol, company_name, cik)
-
-        if not financial_data:
-            raise HTTPException(status_code=404, detail=f"Could not extract financial data for {symbol}")
-
-        # Validation logging
-        print(f"DEBUG: Extracted data summary for {symbol}:")
-        print(f"  - Total metrics: {len(financial_data)}")
-        if financial_data:
-            annual_count = sum(1 for d in financial_data if d['filing_type'] == '10-K')
-            quarterly_count = sum(1 for d in financial_data if d['filing_type'] == '10-Q')
-            print(f"  - Annual (10-K): {annual_count}")
-            print(f"  - Quarterly (10-Q): {quarterly_count}")
-
-            annual_periods = sorted(set(d['period_label'] for d in financial_data if d['filing_type'] == '10-K'))
-            quarterly_periods = sorted(set(d['period_label'] for d in financial_data if d['filing_type'] == '10-Q'))
-            print(f"  - Annual periods: {annual_periods}")
-            print(f"  - Quarterly periods: {quarterly_periods}")
-
-        # Store in database
-        metrics_added = 0
-        print(f"DEBUG: Starting to store {len(financial_data)} metrics for {symbol}")
-
-        for data_point in financial_data:
-            try:
-                period_end = data_point['period_end']
-                filing_type = data_point['filing_type']
-
-                # Match filing by period to get accurate filing_date
-                if filing_type == '10-K':
-                    # Find 10-K filing with year matching the period_end
-                    filing = db.query(Filing10K).filter(
-                        Filing10K.symbol == symbol,
-                        Filing10K.year == period_end.year
-                    ).order_by(Filing10K.filing_date.desc()).first()
-
-                    if not filing and filings_10k:
-                        # Fallback to most recent 10-K if specific year not found
-                        filing = filings_10k[0]
-                else:  # 10-Q
-                    # Find 10-Q filing with year and quarter matching the period_end
-                    period_quarter = ((period_end.month - 1) // 3) + 1
-                    filing = db.query(Filing10Q).filter(
-                        Filing10Q.symbol == symbol,
-                        Filing10Q.year == period_end.year,
-                        Filing10Q.quarter == period_quarter
-                    ).order_by(Filing10Q.filing_date.desc()).first()
-
-                    if not filing and filings_10q:
-                        # Fallback to most recent 10-Q if specific quarter not found
-                        filing = filings_10q[0]
-
-                if not filing:
-                    print(f"WARNING: No filing found for {filing_type} period {period_end}, skipping metric {data_point['metric_name']}")
-                    continue
-
-                filing_date = filing.filing_date
-
-                db_financial = FinancialData(
-                    symbol=symbol,
-                    filing_type=filing_type,
-                    filing_date=filing_date,
-                    period_end=period_end,
-                    period_start=None,
-                    statement_type=data_point['statement_type'],
-                    metric_name=data_point['metric_name'],
-                    metric_label=data_point['metric_label'],
-                    value=data_point['value'],
-                    unit="USD",
-                    extracted_date=datetime.now()
-                )
-
-                db.add(db_financial)
-                db.commit()
-                metrics_added += 1
-
-            except IntegrityError as e:
-                db.rollback()
-                # Expected behavior - duplicate period/metric combination
-                print(f"DEBUG: Skipping duplicate metric: {data_point['metric_name']} for period {data_point.get('period_end', 'unknown')}")
-                continue
-            except Exception as e:
-                db.rollback()
-                print(f"Error storing metric {data_point['metric_name']}: {str(e)}")
-                continue
-
-        # Get counts
-        total_metrics = db.query(FinancialData).filter_by(symbol=symbol).count()
-        print(f"DEBUG: Stored {metrics_added} metrics, total in DB: {total_metrics}")
-
-        return {
-            "symbol": symbol,
-            "company_name": company_name,
-            "metrics_added": metrics_added,
-            "total_metrics": total_metrics,
-            "statements_extracted": ["income_statement", "balance_sheet", "cash_flow"]
-        }
+        return Response(
+            content=arrow_service.to_parquet(table),
+            media_type=arrow_service.PARQUET_MEDIA_TYPE,
+            headers={"Content-Disposition": 'attachment; filename="financials.parquet"'}
+        )
 
     except HTTPException:
         raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error extracting financials: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error exporting financials: {str(e)}")
 
 @router.get("/financials/{symbol}")
 async def get_financials(
     symbol: str,
     statement_type: str = None,
+    as_of: date = None,
     db: Session = Depends(get_db)
 ):
     """
     Retrieve stored financial data for a given ticker symbol.
     Optionally filter by statement_type: income_statement, balance_sheet, or cash_flow
+    Each value is the latest version known as of as_of (YYYY-MM-DD), or the latest overall.
     """
     try:
-        query = db.query(FinancialData).filter_by(symbol=symbol)
-
+        conditions = (FinancialData.symbol == symbol,)
         if statement_type:
-            query = query.filter_by(statement_type=statement_type)
+            conditions += (FinancialData.statement_type == statement_type,)
 
-        financial_data = query.order_by(
-            FinancialData.period_end.desc(),
-            FinancialData.statement_type,
-            FinancialData.metric_name
+        version, version_rank = financial_service.versions_as_of(*conditions, as_of=as_of)
+        financial_data = db.query(version).filter(version_rank == 1).order_by(
+            version.period_end.desc(),
+            version.statement_type,
+            version.metric_name
         ).all()
 
         if not financial_data:
@@ -331,6 +140,7 @@ async def get_financials(
 
         return {
             "symbol": symbol,
+            "as_of": as_of.isoformat() if as_of else None,
             "total_metrics": len(financial_data),
             "statements": result
         }
@@ -344,6 +154,7 @@ async def get_financials(
 async def get_revenue(
     symbol: str,
     filing_type: str = "10-K",
+    as_of: date = None,
     db: Session = Depends(get_db)
 ):
     """
@@ -352,6 +163,7 @@ async def get_revenue(
     Args:
         symbol: Ticker symbol (e.g., 'AAPL')
         filing_type: '10-K' (annual, default) or '10-Q' (quarterly)
+        as_of: Optional date (YYYY-MM-DD); only values filed on or before it are used
 
     Returns:
         List of revenue records with period_end date, sorted by period_end descending
@@ -376,12 +188,14 @@ async def get_revenue(
             "SalesRevenue",
         ]
 
-        revenue_data = db.query(FinancialData).filter(
+        version, version_rank = financial_service.versions_as_of(
             FinancialData.symbol == symbol,
             FinancialData.filing_type == filing_type,
             FinancialData.statement_type == "income_statement",
-            FinancialData.metric_name.in_(revenue_concepts)
-        ).order_by(FinancialData.period_end.desc()).all()
+            FinancialData.metric_name.in_(revenue_concepts),
+            as_of=as_of
+        )
+        revenue_data = db.query(version).filter(version_rank == 1).order_by(version.period_end.desc()).all()
 
         if not revenue_data:
             raise HTTPException(
@@ -405,6 +219,7 @@ async def get_revenue(
         return {
             "symbol": symbol,
             "filing_type": filing_type,
+            "as_of": as_of.isoformat() if as_of else None,
             "count": len(result),
             "revenue_data": result
         }
@@ -413,3 +228,116 @@ async def get_revenue(
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error retrieving revenue data: {str(e)}")
+
+@router.get("/compare")
+async def compare_financials(
+    symbols: str,
+    metrics: str,
+    period: str = "quarterly",
+    statement_type: str = "income_statement",
+    as_of: date = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Compare metrics across several companies on one calendar-aligned period axis.
+
+    Args:
+        symbols: Comma-separated ticker symbols (e.g., 'AAPL,MSFT,GOOGL')
+        metrics: Comma-separated metric names (e.g., 'Revenues,NetIncomeLoss')
+        period: 'quarterly' (10-Q, default) or 'annual' (10-K)
+        statement_type: income_statement (default), balance_sheet or cash_flow;
+                        a metric name can appear in more than one statement
+        as_of: Optional date (YYYY-MM-DD); only values filed on or before it are used
+
+    Returns:
+        A shared period axis (oldest first) and, per metric, a symbols x periods
+        value matrix with null where a company has no value for that period.
+        period_ends gives each company's actual fiscal period end per column.
+        conflicts lists cells left null because more than one of a company's
+        period ends maps to that column.
+    """
+    try:
+        period_filing_types = {"quarterly": "10-Q", "annual": "10-K"}
+        if period not in period_filing_types:
+            raise HTTPException(
+                status_code=400,
+                detail="period must be 'quarterly' (10-Q) or 'annual' (10-K). Default is 'quarterly'."
+            )
+
+        symbol_list = list(dict.fromkeys(s.strip() for s in symbols.split(",") if s.strip()))
+        metric_list = list(dict.fromkeys(m.strip() for m in metrics.split(",") if m.strip()))
+        if not symbol_list or not metric_list:
+            raise HTTPException(status_code=400, detail="symbols and metrics must each name at least one value")
+        if len(symbol_list) > MAX_COMPARE_SYMBOLS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"At most {MAX_COMPARE_SYMBOLS} symbols can be compared at once"
+            )
+
+        # One query for every company: the latest version of each value known as of
+        # as_of, selecting plain columns so no ORM objects are built
+        version, version_rank = financial_service.versions_as_of(
+            FinancialData.symbol.in_(symbol_list),
+            FinancialData.filing_type == period_filing_types[period],
+            FinancialData.statement_type == statement_type,
+            FinancialData.metric_name.in_(metric_list),
+            as_of=as_of
+        )
+        rows = db.query(
+            version.symbol,
+            version.metric_name,
+            version.period_end,
+            version.value,
+        ).filter(version_rank == 1).order_by(version.period_end).all()
+
+        if not rows:
+            raise HTTPException(status_code=404, detail=f"No {period} data found for {', '.join(symbol_list)}")
+
+        cells = {}
+        period_ends = {}
+        conflicts = {}
+        for symbol, metric_name, period_end, value in rows:
+            label = financial_service.calendar_period_label(period_end, period)
+            known = period_ends.setdefault((symbol, label), period_end)
+            if known != period_end:
+                # Two of a company's period ends land in one calendar period; report
+                # them instead of letting one silently overwrite the other
+                conflicts.setdefault((symbol, label), {known}).add(period_end)
+                continue
+            cells[(metric_name, symbol, label)] = value
+
+        periods = sorted({label for (_, label) in period_ends})
+        column = {label: i for i, label in enumerate(periods)}
+
+        row = {symbol: i for i, symbol in enumerate(symbol_list)}
+        values = {metric_name: [[None] * len(periods) for _ in symbol_list] for metric_name in metric_list}
+        for (metric_name, symbol, label), value in cells.items():
+            if (symbol, label) not in conflicts:
+                values[metric_name][row[symbol]][column[label]] = value
+
+        return {
+            "period": period,
+            "statement_type": statement_type,
+            "as_of": as_of.isoformat() if as_of else None,
+            "symbols": symbol_list,
+            "metrics": metric_list,
+            "periods": periods,
+            "period_ends": {
+                symbol: [
+                    period_ends[(symbol, label)].isoformat()
+                    if (symbol, label) in period_ends and (symbol, label) not in conflicts else None
+                    for label in periods
+                ]
+                for symbol in symbol_list
+            },
+            "values": values,
+            "conflicts": [
+                {"symbol": symbol, "period": label, "period_ends": sorted(d.isoformat() for d in dates)}
+                for (symbol, label), dates in sorted(conflicts.items())
+            ]
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error comparing financials: {str(e)}")
@@ -1,5 +1,6 @@
 from fastapi import APIRouter
 from pydantic import BaseModel
+from database import engines, pool_wait_stats
 
 router = APIRouter(prefix="/api/health", tags=["health"])
 
@@ -16,3 +17,17 @@ async def get_health():
         status="healthy",
         message="Signal Refinery API is running"
     )
+
+
+@router.get("/db")
+async def get_db_health():
+    """Report pool occupancy and connection checkout wait times per engine"""
+    return {
+        role: {
+            "dialect": engine.dialect.name,
+            "is_replica": role == "read" and str(engine.url) != str(engines["write"].url),
+            "pool": engine.pool.status(),
+            "checkout_wait": pool_wait_stats[role].snapshot(),
+        }
+        for role, engine in engines.items()
+    }
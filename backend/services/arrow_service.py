@@ -0,0 +1,299 @@
+import io
+from datetime import date, datetime
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+from sqlalchemy import Column, MetaData, Table, func, insert, select, true
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from database import FinancialData
+import services.coverage_service as coverage_service
+import services.financial_service as financial_service
+
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+PARQUET_MEDIA_TYPE = "application/vnd.apache.parquet"
+
+# Column layout shared by the Arrow/Parquet exports and the Parquet import.
+# Low-cardinality strings are dictionary-encoded so they cost an int per row.
+FINANCIAL_DATA_SCHEMA = pa.schema([
+    ("symbol", pa.dictionary(pa.int32(), pa.string())),
+    ("filing_type", pa.dictionary(pa.int32(), pa.string())),
+    ("filing_date", pa.date32()),
+    ("period_start", pa.date32()),
+    ("period_end", pa.date32()),
+    ("statement_type", pa.dictionary(pa.int32(), pa.string())),
+    ("metric_name", pa.dictionary(pa.int32(), pa.string())),
+    ("metric_label", pa.dictionary(pa.int32(), pa.string())),
+    ("value", pa.float64()),
+    ("unit", pa.dictionary(pa.int32(), pa.string())),
+    ("extracted_date", pa.timestamp("us")),
+])
+
+# Columns of _financial_data_unique, the conflict target for imports
+FINANCIAL_DATA_KEY = ["symbol", "filing_type", "filing_date", "statement_type", "metric_name", "period_end"]
+
+REQUIRED_IMPORT_COLUMNS = {"symbol", "filing_type", "filing_date", "period_end", "statement_type", "metric_name", "value"}
+
+
+def financial_data_select(symbols, statement_type: str = None, filing_type: str = None,
+                          as_of: date = None, all_versions: bool = False):
+    """
+    Column-only select over financial_data in FINANCIAL_DATA_SCHEMA order.
+
+    By default only the latest version of each value known as of as_of is
+    returned; all_versions returns the full restatement history instead.
+    """
+    conditions = (FinancialData.symbol.in_(symbols),)
+    if statement_type:
+        conditions += (FinancialData.statement_type == statement_type,)
+    if filing_type:
+        conditions += (FinancialData.filing_type == filing_type,)
+
+    if all_versions:
+        if as_of:
+            conditions += (FinancialData.filing_date <= as_of,)
+        source = FinancialData
+        query = select(*(getattr(source, field.name) for field in FINANCIAL_DATA_SCHEMA)).where(*conditions)
+    else:
+        source, version_rank = financial_service.versions_as_of(*conditions, as_of=as_of)
+        query = select(*(getattr(source, field.name) for field in FINANCIAL_DATA_SCHEMA)).where(version_rank == 1)
+
+    return query.order_by(
+        source.symbol,
+        source.period_end,
+        source.statement_type,
+        source.metric_name,
+        source.filing_date
+    )
+
+
+def build_table(rows):
+    """Turn result rows into an Arrow table one column at a time, without per-row dicts."""
+    arrays = []
+    for i, field in enumerate(FINANCIAL_DATA_SCHEMA):
+        # Per-column comprehensions; zip(*rows) allocates enough tuples to trip the GC repeatedly
+        values = [row[i] for row in rows]
+        if pa.types.is_dictionary(field.type):
+            arrays.append(pa.array(values, type=field.type.value_type).dictionary_encode())
+        else:
+            arrays.append(pa.array(values, type=field.type))
+    return pa.Table.from_arrays(arrays, schema=FINANCIAL_DATA_SCHEMA)
+
+
+def _copy_table(db: Session, query):
+    """
+    Fetch a select as an Arrow table through PostgreSQL COPY ... TO STDOUT.
+
+    The server writes CSV and Arrow parses it column by column, so no Python
+    object is built per row or value.
+    """
+    connection = db.connection()
+    compiled = query.compile(dialect=connection.dialect, compile_kwargs={"render_postcompile": True})
+    buffer = io.BytesIO()
+    with connection.connection.dbapi_connection.cursor() as cursor:
+        sql = cursor.mogrify(str(compiled), compiled.params).decode()
+        cursor.copy_expert(f"COPY ({sql}) TO STDOUT WITH (FORMAT csv, HEADER true)", buffer)
+    buffer.seek(0)
+
+    table = pa_csv.read_csv(buffer, convert_options=pa_csv.ConvertOptions(
+        column_types={
+            field.name: field.type.value_type if pa.types.is_dictionary(field.type) else field.type
+            for field in FINANCIAL_DATA_SCHEMA
+        },
+        # COPY writes NULL unquoted and empty strings as ""
+        strings_can_be_null=True,
+        quoted_strings_can_be_null=False,
+    ))
+    return pa.Table.from_arrays(
+        [
+            table.column(field.name).dictionary_encode() if pa.types.is_dictionary(field.type) else table.column(field.name)
+            for field in FINANCIAL_DATA_SCHEMA
+        ],
+        schema=FINANCIAL_DATA_SCHEMA
+    )
+
+
+def query_table(db: Session, query):
+    if db.get_bind().dialect.name == "postgresql":
+        return _copy_table(db, query)
+    return build_table(db.execute(query).all())
+
+
+def to_arrow_ipc(table: pa.Table):
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def to_parquet(table: pa.Table):
+    sink = io.BytesIO()
+    pq.write_table(table, sink, compression="zstd")
+    return sink.getvalue()
+
+
+def _staging_table():
+    """Temporary table with the import columns, which Parquet batches are loaded into first."""
+    return Table(
+        "financial_data_import",
+        MetaData(),
+        *(Column(field.name, FinancialData.__table__.c[field.name].type) for field in FINANCIAL_DATA_SCHEMA),
+        prefixes=["TEMPORARY"],
+    )
+
+
+def _prepare_batch(batch: pa.RecordBatch, extracted_date: datetime):
+    """
+    Conform a Parquet batch to the staging columns: plain (not dictionary) types,
+    absent columns as nulls, and null unit/metric_label/extracted_date defaulted.
+    """
+    columns = []
+    for field in FINANCIAL_DATA_SCHEMA:
+        value_type = field.type.value_type if pa.types.is_dictionary(field.type) else field.type
+        if field.name in batch.schema.names:
+            columns.append(batch.column(field.name).cast(value_type))
+        else:
+            columns.append(pa.nulls(batch.num_rows, type=value_type))
+    batch = pa.RecordBatch.from_arrays(columns, names=FINANCIAL_DATA_SCHEMA.names)
+
+    names = FINANCIAL_DATA_SCHEMA.names
+    columns[names.index("unit")] = pc.fill_null(batch.column("unit"), "USD")
+    columns[names.index("metric_label")] = pc.coalesce(batch.column("metric_label"), batch.column("metric_name"))
+    columns[names.index("extracted_date")] = pc.fill_null(
+        batch.column("extracted_date"), pa.scalar(extracted_date, type=pa.timestamp("us"))
+    )
+    return pa.RecordBatch.from_arrays(columns, names=names)
+
+
+def _stage_batch(connection, staging: Table, batch: pa.RecordBatch):
+    if connection.dialect.name == "postgresql":
+        # Arrow writes the batch as CSV column by column and COPY parses it server side
+        buffer = io.BytesIO()
+        pa_csv.write_csv(batch, buffer)
+        buffer.seek(0)
+        with connection.connection.dbapi_connection.cursor() as cursor:
+            cursor.copy_expert(
+                f"COPY {staging.name} ({', '.join(batch.schema.names)}) FROM STDIN WITH (FORMAT csv, HEADER true)",
+                buffer
+            )
+    elif connection.dialect.name == "sqlite":
+        # SQLite stores dates and timestamps as ISO text, which Arrow renders a column
+        # at a time, so the driver's executemany gets plain tuples with nothing to convert
+        columns = [column.cast(pa.string()) if pa.types.is_temporal(column.type) else column for column in batch.columns]
+        connection.exec_driver_sql(
+            str(insert(staging).compile(dialect=connection.dialect)),
+            list(zip(*(column.to_pylist() for column in columns)))
+        )
+    else:
+        connection.execute(insert(staging), batch.to_pylist())
+
+
+def _insert_staged(connection, staging: Table):
+    """
+    Copy staged rows into financial_data, skipping rows that hit _financial_data_unique.
+
+    Returns per-symbol coverage stats (see coverage_service.add_financial_rows)
+    for the rows actually inserted, or None where the dialect can't report them.
+    """
+    columns = FINANCIAL_DATA_SCHEMA.names
+    # SQLite needs a WHERE on INSERT ... SELECT ... ON CONFLICT to parse it; key
+    # order keeps the unique-index inserts local instead of scattered
+    staged = select(*(staging.c[name] for name in columns)).where(true()).order_by(
+        *(staging.c[name] for name in FINANCIAL_DATA_KEY)
+    )
+    returned = (FinancialData.symbol, FinancialData.filing_type, FinancialData.period_end, FinancialData.extracted_date)
+    dialect = connection.dialect.name
+
+    if dialect == "postgresql":
+        # Aggregate what was inserted in the same statement, so no rows come back to Python
+        inserted = postgresql.insert(FinancialData).from_select(columns, staged).on_conflict_do_nothing(
+            index_elements=FINANCIAL_DATA_KEY
+        ).returning(*returned).cte("inserted")
+        stats = {}
+        for symbol, filing_type, count, first_period, last_period, last_extracted in connection.execute(
+            select(
+                inserted.c.symbol,
+                inserted.c.filing_type,
+                func.count(),
+                func.min(inserted.c.period_end),
+                func.max(inserted.c.period_end),
+                func.max(inserted.c.extracted_date),
+            ).group_by(inserted.c.symbol, inserted.c.filing_type)
+        ):
+            stats.setdefault(symbol, {})[filing_type] = (count, first_period, last_period, last_extracted)
+        return stats
+
+    if dialect == "sqlite":
+        rows = {}
+        for symbol, filing_type, period_end, extracted_date in connection.execute(
+            sqlite.insert(FinancialData).from_select(columns, staged).on_conflict_do_nothing(
+                index_elements=FINANCIAL_DATA_KEY
+            ).returning(*returned)
+        ):
+            rows.setdefault(symbol, []).append((filing_type, period_end, extracted_date))
+        return {symbol: coverage_service.summarize_financial_rows(symbol_rows) for symbol, symbol_rows in rows.items()}
+
+    connection.execute(insert(FinancialData).from_select(columns, staged))
+    return None
+
+
+def import_parquet(source, db: Session, batch_size: int = 50_000):
+    """
+    Load a Parquet file (path or file-like) into financial_data.
+
+    Batches are staged in a temporary table (via COPY on PostgreSQL), then
+    moved into financial_data with one INSERT ... SELECT that skips rows
+    already stored. The whole file commits as one transaction together with
+    the coverage update for the symbols it added rows to.
+
+    Returns:
+        Dict with rows_read, rows_inserted, batches and symbols counts
+    """
+    parquet_file = pq.ParquetFile(source)
+    missing = REQUIRED_IMPORT_COLUMNS - set(parquet_file.schema_arrow.names)
+    if missing:
+        raise ValueError(f"Parquet file is missing required columns: {', '.join(sorted(missing))}")
+
+    wanted = [field.name for field in FINANCIAL_DATA_SCHEMA if field.name in parquet_file.schema_arrow.names]
+    extracted_date = datetime.now()
+    rows_read = 0
+    batches = 0
+
+    staging = _staging_table()
+    try:
+        connection = db.connection()
+        # A temporary table outlives a rolled-back import on a pooled connection
+        staging.drop(connection, checkfirst=True)
+        staging.create(connection)
+
+        for batch in parquet_file.iter_batches(batch_size=batch_size, columns=wanted):
+            if not batch.num_rows:
+                continue
+            _stage_batch(connection, staging, _prepare_batch(batch, extracted_date))
+            rows_read += batch.num_rows
+            batches += 1
+
+        stats = _insert_staged(connection, staging)
+        if stats is None:
+            symbols = list(connection.execute(select(staging.c.symbol).distinct()).scalars())
+            for symbol in symbols:
+                coverage_service.refresh_symbol_coverage(symbol, db)
+        else:
+            symbols = list(stats)
+            for symbol, symbol_stats in stats.items():
+                coverage_service.add_financial_rows(symbol, db, symbol_stats)
+
+        staging.drop(connection)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    rows_inserted = sum(count for symbol_stats in (stats or {}).values() for count, *_ in symbol_stats.values())
+    return {
+        "rows_read": rows_read,
+        "rows_inserted": rows_inserted if stats is not None else None,
+        "batches": batches,
+        "symbols": len(symbols),
+    }
@@ -0,0 +1,164 @@
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from database import Filing10K, Filing10Q, FinancialData, SymbolCoverage
+
+
+def refresh_symbol_coverage(symbol: str, db: Session):
+    """
+    Recompute the symbol_coverage row for one symbol inside the caller's transaction.
+
+    Writers keep the row current incrementally (add_filings, add_financial_rows)
+    and only fall back to this when a symbol has no row yet; it is also the
+    repair path behind `backfill.py --rebuild-coverage`. Every aggregate is
+    scoped to one symbol and served by the symbol indexes.
+    """
+    # The session does not autoflush; make pending rows visible to the aggregates
+    db.flush()
+
+    coverage = db.query(SymbolCoverage).filter_by(symbol=symbol).with_for_update().first()
+    if coverage is None:
+        coverage = SymbolCoverage(symbol=symbol)
+        db.add(coverage)
+
+    filings_10k, last_10k_date = db.query(
+        func.count(Filing10K.id), func.max(Filing10K.filing_date)
+    ).filter(Filing10K.symbol == symbol).one()
+    filings_10q, last_10q_date = db.query(
+        func.count(Filing10Q.id), func.max(Filing10Q.filing_date)
+    ).filter(Filing10Q.symbol == symbol).one()
+
+    coverage.filings_10k = filings_10k
+    coverage.filings_10q = filings_10q
+    coverage.last_filing_date = max((d for d in (last_10k_date, last_10q_date) if d), default=None)
+
+    financial_stats = {
+        filing_type: (count, first_period, last_period, last_extracted)
+        for filing_type, count, first_period, last_period, last_extracted in db.query(
+            FinancialData.filing_type,
+            func.count(FinancialData.id),
+            func.min(FinancialData.period_end),
+            func.max(FinancialData.period_end),
+            func.max(FinancialData.extracted_date),
+        ).filter(FinancialData.symbol == symbol).group_by(FinancialData.filing_type)
+    }
+    annual = financial_stats.get("10-K", (0, None, None, None))
+    quarterly = financial_stats.get("10-Q", (0, None, None, None))
+    coverage.financial_rows_10k, coverage.first_period_10k, coverage.last_period_10k = annual[:3]
+    coverage.financial_rows_10q, coverage.first_period_10q, coverage.last_period_10q = quarterly[:3]
+    coverage.last_extracted_at = max((s[3] for s in (annual, quarterly) if s[3]), default=None)
+
+    return coverage
+
+
+# symbol_coverage columns holding each filing type's row count and period bounds
+FINANCIAL_COLUMNS = {
+    "10-K": ("financial_rows_10k", "first_period_10k", "last_period_10k"),
+    "10-Q": ("financial_rows_10q", "first_period_10q", "last_period_10q"),
+}
+
+
+def _earliest(*values):
+    return min((v for v in values if v), default=None)
+
+
+def _latest(*values):
+    return max((v for v in values if v), default=None)
+
+
+def _locked_coverage(symbol: str, db: Session):
+    """The symbol's coverage row locked for update, or None if it has never been built."""
+    return db.query(SymbolCoverage).filter_by(symbol=symbol).with_for_update().first()
+
+
+def add_filings(symbol: str, db: Session, filings):
+    """
+    Fold newly inserted filings, as (form, filing_date) pairs, into the symbol's
+    coverage row inside the caller's transaction.
+
+    Only the first write for a symbol aggregates its stored rows (to build the
+    row); after that the counts are maintained from what is being written.
+    """
+    coverage = _locked_coverage(symbol, db)
+    if coverage is None:
+        return refresh_symbol_coverage(symbol, db)
+
+    coverage.filings_10k = (coverage.filings_10k or 0) + sum(1 for form, _ in filings if form == "10-K")
+    coverage.filings_10q = (coverage.filings_10q or 0) + sum(1 for form, _ in filings if form == "10-Q")
+    coverage.last_filing_date = _latest(coverage.last_filing_date, *(filing_date for _, filing_date in filings))
+    return coverage
+
+
+def summarize_financial_rows(rows):
+    """
+    Per-filing-type (count, first period_end, last period_end, last extracted_date)
+    for (filing_type, period_end, extracted_date) tuples, the shape add_financial_rows takes.
+    """
+    stats = {}
+    for filing_type, period_end, extracted_date in rows:
+        count, first, last, extracted = stats.get(filing_type, (0, None, None, None))
+        stats[filing_type] = (
+            count + 1,
+            _earliest(first, period_end),
+            _latest(last, period_end),
+            _latest(extracted, extracted_date),
+        )
+    return stats
+
+
+def add_financial_rows(symbol: str, db: Session, stats):
+    """
+    Fold newly inserted financial_data rows into the symbol's coverage row inside
+    the caller's transaction; stats maps filing_type to (count, first period_end,
+    last period_end, last extracted_date) for just the inserted rows.
+    """
+    coverage = _locked_coverage(symbol, db)
+    if coverage is None:
+        return refresh_symbol_coverage(symbol, db)
+
+    for filing_type, (count, first_period, last_period, last_extracted) in stats.items():
+        if filing_type not in FINANCIAL_COLUMNS:
+            continue
+        rows_column, first_column, last_column = FINANCIAL_COLUMNS[filing_type]
+        setattr(coverage, rows_column, (getattr(coverage, rows_column) or 0) + count)
+        setattr(coverage, first_column, _earliest(getattr(coverage, first_column), first_period))
+        setattr(coverage, last_column, _latest(getattr(coverage, last_column), last_period))
+        coverage.last_extracted_at = _latest(coverage.last_extracted_at, last_extracted)
+    return coverage
+
+
+def refresh_all_coverage(db: Session):
+    """Rebuild symbol_coverage for every symbol that has filings or financial data."""
+    symbols = {s for (s,) in db.query(Filing10K.symbol).distinct()}
+    symbols |= {s for (s,) in db.query(Filing10Q.symbol).distinct()}
+    symbols |= {s for (s,) in db.query(FinancialData.symbol).distinct()}
+    for symbol in sorted(symbols):
+        refresh_symbol_coverage(symbol, db)
+        db.commit()
+    return len(symbols)
+
+
+def coverage_to_dict(coverage: SymbolCoverage):
+    def iso(value):
+        return value.isoformat() if value else None
+
+    return {
+        "symbol": coverage.symbol,
+        "filings_10k": coverage.filings_10k,
+        "filings_10q": coverage.filings_10q,
+        "last_filing_date": iso(coverage.last_filing_date),
+        "financial_rows": (coverage.financial_rows_10k or 0) + (coverage.financial_rows_10q or 0),
+        "periods": {
+            "10-K": {
+                "rows": coverage.financial_rows_10k,
+                "first_period_end": iso(coverage.first_period_10k),
+                "last_period_end": iso(coverage.last_period_10k),
+            },
+            "10-Q": {
+                "rows": coverage.financial_rows_10q,
+                "first_period_end": iso(coverage.first_period_10q),
+                "last_period_end": iso(coverage.last_period_10q),
+            },
+        },
+        "last_extracted_at": iso(coverage.last_extracted_at),
+        "updated_at": iso(coverage.updated_at),
+    }
@@ -0,0 +1,295 @@
+import hashlib
+import json
+import mmap
+import os
+import re
+import struct
+import tempfile
+import urllib.request
+import zlib
+from html.parser import HTMLParser
+from urllib.parse import urljoin
+
+# Local, per-host store of filing primary documents. Each document is one file:
+# MAGIC, a 4-byte header length, a JSON header (chunk offsets + section index),
+# then the plain text compressed in independent zlib chunks so any byte range
+# can be read by decompressing only the chunks that overlap it.
+FILING_STORE_DIR = os.getenv("FILING_STORE_DIR", "./filing_store")
+FILING_STORE_MAX_BYTES = int(os.getenv("FILING_STORE_MAX_BYTES", str(1024 ** 3)))
+CHUNK_SIZE = 64 * 1024
+
+SEC_USER_AGENT = "SignalRefinery Admin user@example.com"
+MAGIC = b"SRFDOC1\n"
+_HEADER_LENGTH = struct.Struct("<I")
+
+_ACCESSION_NUMBER = re.compile(r"(\d{10}-\d{2}-\d{6})")
+_PRIMARY_DOCUMENT_LINK = re.compile(r'href="(?:/ix\?doc=)?(/Archives/edgar/data/[^"]+?\.html?)"', re.IGNORECASE)
+_PART_HEADING = re.compile(rb"^[ \t]*part[ \t]+(IV|I{1,3})\b", re.IGNORECASE | re.MULTILINE)
+_ITEM_HEADING = re.compile(rb"^[ \t]*item[ \t]+(\d{1,2}[A-C]?)\b", re.IGNORECASE | re.MULTILINE)
+
+
+class _TextExtractor(HTMLParser):
+    """Flatten filing HTML to text, one line per block element, skipping hidden XBRL headers."""
+
+    BLOCK_TAGS = {"p", "div", "br", "tr", "li", "table", "h1", "h2", "h3", "h4", "h5", "h6"}
+    SKIP_TAGS = {"script", "style", "ix:header"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self._skip_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP_TAGS:
+            self._skip_depth += 1
+        elif tag in self.BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP_TAGS:
+            self._skip_depth = max(0, self._skip_depth - 1)
+        elif tag in self.BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_data(self, data):
+        if not self._skip_depth:
+            self.parts.append(data)
+
+
+def html_to_text(html: str):
+    extractor = _TextExtractor()
+    extractor.feed(html)
+    extractor.close()
+    lines = (" ".join(line.replace("\xa0", " ").split()) for line in "".join(extractor.parts).splitlines())
+    return "\n".join(line for line in lines if line)
+
+
+def _download(url: str):
+    request = urllib.request.Request(url, headers={"User-Agent": SEC_USER_AGENT})
+    with urllib.request.urlopen(request, timeout=60) as response:
+        return response.read().decode("utf-8", errors="replace")
+
+
+def resolve_primary_document_url(url: str):
+    """Filing URLs point at the EDGAR index page; its first document link is the primary document."""
+    if not re.search(r"-index\.html?$", url):
+        return url
+    match = _PRIMARY_DOCUMENT_LINK.search(_download(url))
+    if not match:
+        raise ValueError(f"No primary document listed on {url}")
+    return urljoin(url, match.group(1))
+
+
+def build_section_index(text: bytes, form: str):
+    """
+    Map item keys to (start, end) byte offsets in text.
+
+    10-K items are keyed by number ('1A', '7'); 10-Q items repeat across parts,
+    so they are keyed by part ('I-2', 'II-1A'). A heading can appear several
+    times (table of contents, cross references); the occurrence that starts
+    the longest run of text is taken as the section itself.
+    """
+    headings = sorted(
+        [(m.start(), "part", m.group(1).upper().decode()) for m in _PART_HEADING.finditer(text)]
+        + [(m.start(), "item", m.group(1).upper().decode()) for m in _ITEM_HEADING.finditer(text)]
+    )
+
+    candidates = {}
+    part = "I"
+    for i, (start, kind, label) in enumerate(headings):
+        if kind == "part":
+            part = label
+            continue
+        key = label if form == "10-K" else f"{part}-{label}"
+        span = (headings[i + 1][0] if i + 1 < len(headings) else len(text)) - start
+        if key not in candidates or span > candidates[key][1]:
+            candidates[key] = (start, span)
+
+    starts = sorted((start, key) for key, (start, _) in candidates.items())
+    boundaries = sorted({start for start, _, _ in headings} | {len(text)})
+    sections = {}
+    for start, key in starts:
+        # A section runs until the next heading of any kind (item or part)
+        end = next(b for b in boundaries if b > start)
+        sections[key] = [start, end]
+    return sections
+
+
+def _document_path(form: str, filing_url: str):
+    """Key stored documents by accession number (or a hash of the URL), not by row id, so they survive DB rebuilds."""
+    match = _ACCESSION_NUMBER.search(filing_url)
+    key = match.group(1) if match else hashlib.sha1(filing_url.encode()).hexdigest()
+    return os.path.join(FILING_STORE_DIR, form, f"{key}.doc")
+
+
+def write_document(path: str, text: bytes, header: dict):
+    """Chunk-compress text into path atomically, recording chunk offsets in the header."""
+    chunks = [zlib.compress(text[i:i + CHUNK_SIZE], 6) for i in range(0, len(text), CHUNK_SIZE)]
+    offsets = [0]
+    for chunk in chunks:
+        offsets.append(offsets[-1] + len(chunk))
+    header = {**header, "chunk_size": CHUNK_SIZE, "text_bytes": len(text), "chunk_offsets": offsets}
+    header_bytes = json.dumps(header).encode()
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(MAGIC)
+            f.write(_HEADER_LENGTH.pack(len(header_bytes)))
+            f.write(header_bytes)
+            for chunk in chunks:
+                f.write(chunk)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return header
+
+
+def _read_header(mapped):
+    if mapped[:len(MAGIC)] != MAGIC:
+        raise ValueError("Not a filing document file")
+    (length,) = _HEADER_LENGTH.unpack_from(mapped, len(MAGIC))
+    data_start = len(MAGIC) + _HEADER_LENGTH.size + length
+    return json.loads(mapped[len(MAGIC) + _HEADER_LENGTH.size:data_start]), data_start
+
+
+def read_header(path: str):
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        return _read_header(mapped)[0]
+
+
+def read_range(path: str, start: int, end: int):
+    """Return text bytes [start, end) by decompressing only the overlapping chunks."""
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        header, data_start = _read_header(mapped)
+        chunk_size = header["chunk_size"]
+        offsets = header["chunk_offsets"]
+        end = min(end, header["text_bytes"])
+        if start >= end:
+            return b""
+
+        first, last = start // chunk_size, (end - 1) // chunk_size
+        text = b"".join(
+            zlib.decompress(mapped[data_start + offsets[i]:data_start + offsets[i + 1]])
+            for i in range(first, last + 1)
+        )
+    base = first * chunk_size
+    return text[start - base:end - base]
+
+
+def enforce_budget(keep_path: str = None):
+    """Delete least recently read documents until the store fits FILING_STORE_MAX_BYTES."""
+    files = []
+    for root, _, names in os.walk(FILING_STORE_DIR):
+        for name in names:
+            if name.endswith(".doc"):
+                path = os.path.join(root, name)
+                stat = os.stat(path)
+                files.append((stat.st_mtime, stat.st_size, path))
+
+    total = sum(size for _, size, _ in files)
+    for _, size, path in sorted(files):
+        if total <= FILING_STORE_MAX_BYTES:
+            break
+        if path == keep_path:
+            continue
+        os.remove(path)
+        total -= size
+    return total
+
+
+def ensure_document(filing, form: str):
+    """Return the local path of a filing's primary document, fetching and indexing it on first use."""
+    path = _document_path(form, filing.url)
+    try:
+        header = read_header(path)
+    except FileNotFoundError:
+        pass
+    else:
+        if header.get("symbol") == filing.symbol and header.get("filing_url") == filing.url:
+            return path
+        print(f"Stored document {path} does not match {filing.symbol} {filing.url}, re-fetching")
+
+    source_url = resolve_primary_document_url(filing.url)
+    text = html_to_text(_download(source_url)).encode("utf-8")
+    write_document(path, text, {
+        "symbol": filing.symbol,
+        "form": form,
+        "filing_id": filing.id,
+        "filing_url": filing.url,
+        "source_url": source_url,
+        "sections": build_section_index(text, form),
+    })
+    enforce_budget(keep_path=path)
+    return path
+
+
+def _touch(path: str):
+    # The file's mtime doubles as its last-read time for budget eviction
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        pass
+
+
+def _read_document(filing, form: str, read):
+    """
+    Return read(path) for the filing's stored document.
+
+    enforce_budget in a concurrent request can evict the file between
+    ensure_document and the read; fetch it again instead of failing.
+    """
+    path = ensure_document(filing, form)
+    try:
+        return read(path)
+    except FileNotFoundError:
+        print(f"Stored document {path} was evicted before it was read, re-fetching")
+        return read(ensure_document(filing, form))
+
+
+def list_sections(filing, form: str):
+    def read(path):
+        header = read_header(path)
+        _touch(path)
+        return {
+            "symbol": filing.symbol,
+            "filing_id": filing.id,
+            "form": form,
+            "source_url": header["source_url"],
+            "text_bytes": header["text_bytes"],
+            "sections": {key: end - start for key, (start, end) in header["sections"].items()},
+        }
+
+    return _read_document(filing, form, read)
+
+
+def get_section(filing, form: str, item: str):
+    """
+    Return one section of a filing as text, or a dict with an "error" key.
+
+    For 10-Qs an unqualified item such as '2' resolves to Part I.
+    """
+    def read(path):
+        sections = read_header(path)["sections"]
+
+        key = item.upper()
+        if key not in sections and form != "10-K":
+            key = next((k for k in sections if k.split("-", 1)[1] == key), key)
+        if key not in sections:
+            return {"error": f"Item '{item}' not found in {form} filing {filing.id}. Available: {', '.join(sections)}"}
+
+        start, end = sections[key]
+        text = read_range(path, start, end).decode("utf-8", errors="replace")
+        _touch(path)
+        return {
+            "symbol": filing.symbol,
+            "filing_id": filing.id,
+            "form": form,
+            "item": key,
+            "length": end - start,
+            "text": text,
+        }
+
+    return _read_document(filing, form, read)
@@ -1,5 +1,6 @@
 from sqlalchemy.orm import Session
 from database import Filing10K, Filing10Q
+import services.coverage_service as coverage_service
 import edgar
 from datetime import datetime, date
 
@@ -16,8 +17,20 @@ def fetch_and_store_filings(symbol: str, db: Session):
         if not filings:
             return {"error": "No filings found for this symbol."}
 
+        # Keys already stored for this symbol (matching _10k_unique/_10q_unique), so a
+        # repeated sync only adds new filings instead of failing on the unique constraint
+        existing_keys = {
+            (str(filing_date), url)
+            for model in (Filing10K, Filing10Q)
+            for filing_date, url in db.query(model.filing_date, model.url).filter(model.symbol == symbol)
+        }
+        added = []
+
         for filing in filings:
             filing_date = filing.filing_date
+            if (str(filing_date), filing.url) in existing_keys:
+                continue
+            existing_keys.add((str(filing_date), filing.url))
             period_of_report = filing.period_of_report
 
             # Convert period_of_report to date object if it's a string
@@ -58,8 +71,10 @@ def fetch_and_store_filings(symbol: str, db: Session):
                 continue
 
             db.add(db_filing)
+            added.append((filing.form, filing_date))
+        coverage_service.add_filings(symbol, db, added)
         db.commit()
-        return {"message": f"Filings for {symbol} have been stored."}
+        return {"message": f"Filings for {symbol} have been stored.", "filings_added": len(added)}
     except ValueError:
         return {"error": f"Symbol '{symbol}' not found in EDGAR database."}
 
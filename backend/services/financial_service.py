@@ -0,0 +1,381 @@
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session, aliased
+from database import FinancialData, Filing10K, Filing10Q
+import services.coverage_service as coverage_service
+from edgar import set_identity
+from datetime import datetime, date, timedelta
+import calendar
+import math
+
+# Set SEC identity for edgar library
+set_identity("SignalRefinery Admin user@example.com")
+
+def parse_period_label(period_label: str, fiscal_year_end_month: int = 12):
+    """
+    Parse period label like 'FY 2025' or 'Q1 2026' to approximate period end date.
+
+    Args:
+        period_label: Period string from EDGAR (e.g., 'FY 2025', 'Q1 2026')
+        fiscal_year_end_month: Month the company's fiscal year ends in (12 = calendar year)
+
+    Returns:
+        Approximate period end date (last day of the fiscal period's final month)
+    """
+    import re
+
+    # Match "FY YYYY" pattern for annual periods
+    fy_match = re.match(r'FY (\d{4})', period_label)
+    if fy_match:
+        year = int(fy_match.group(1))
+        month = fiscal_year_end_month
+    else:
+        # Match "Q# YYYY" pattern for quarterly periods
+        q_match = re.match(r'Q(\d) (\d{4})', period_label)
+        if not q_match:
+            # Fallback to current date if parsing fails
+            return date.today()
+
+        quarter = int(q_match.group(1))
+        year = int(q_match.group(2))
+
+        # Fiscal quarter N ends 3 * (4 - N) months before the fiscal year end,
+        # e.g. Q1 of a September fiscal year ends in December of the prior year
+        month = fiscal_year_end_month - 3 * (4 - quarter)
+        if month <= 0:
+            month += 12
+            year -= 1
+
+    return date(year, month, calendar.monthrange(year, month)[1])
+
+def fiscal_year_end_month(filings_10k):
+    """Most common period_of_report month across a company's 10-Ks, defaulting to December."""
+    months = [f.period_of_report.month for f in filings_10k if f.period_of_report]
+    return max(set(months), key=months.count) if months else 12
+
+def match_period_filing(approximate_end: date, filings):
+    """
+    The filing whose period_of_report is closest to approximate_end, within 45 days.
+    Its period_of_report is the company's real fiscal period end (e.g. 2024-09-28).
+    """
+    candidates = [f for f in filings if f.period_of_report and abs((f.period_of_report - approximate_end).days) <= 45]
+    return min(candidates, key=lambda f: abs((f.period_of_report - approximate_end).days), default=None)
+
+def versions_as_of(*conditions, as_of: date = None):
+    """
+    Point-in-time view of financial_data.
+
+    Each (symbol, filing_type, statement_type, metric_name, period_end) series
+    can hold several versions, one per source filing_date. This returns an
+    alias of FinancialData over the rows matching conditions, ranked newest
+    first within each series (ignoring versions filed after as_of), plus the
+    rank column; filter on rank == 1 to get the latest-known value per period
+    in a single query.
+
+    Returns:
+        (FinancialData alias, version rank column)
+    """
+    if as_of:
+        conditions = conditions + (FinancialData.filing_date <= as_of,)
+    ranked = select(
+        FinancialData,
+        func.row_number().over(
+            partition_by=(
+                FinancialData.symbol,
+                FinancialData.filing_type,
+                FinancialData.statement_type,
+                FinancialData.metric_name,
+                FinancialData.period_end
+            ),
+            order_by=(FinancialData.filing_date.desc(), FinancialData.id.desc())
+        ).label("version_rank")
+    ).where(*conditions).subquery()
+    return aliased(FinancialData, ranked), ranked.c.version_rank
+
+def calendar_period_label(period_end: date, period: str = "quarterly"):
+    """
+    Map a fiscal period end to the calendar period it is nearest to, so that
+    companies with different fiscal year ends line up on one axis.
+
+    Args:
+        period_end: Fiscal period end date
+        period: 'quarterly' (e.g. a quarter ending 2024-09-28 -> '2024Q3') or
+                'annual' (e.g. a fiscal year ending 2024-09-28 -> '2024')
+
+    Returns:
+        Calendar period label
+    """
+    if period == "annual":
+        # Fiscal years ending in the first half belong to the previous calendar year
+        return str(period_end.year if period_end.month > 6 else period_end.year - 1)
+
+    # Shift by half a quarter so e.g. a quarter ending Jan 28 snaps back to Q4
+    shifted = period_end - timedelta(days=45)
+    return f"{shifted.year}Q{(shifted.month - 1) // 3 + 1}"
+
+def extract_financials_from_company(symbol: str, company_name: str, cik: str):
+    """
+    Extract real financial statements from EDGAR using the edgar library.
+    Retrieves 5 years of annual (10-K) and quarterly (10-Q) data for:
+    Income Statement, Balance Sheet, and Cash Flow data.
+    """
+    try:
+        from edgar import Company
+
+        # Create Company instance to get financial data
+        company = Company(symbol)
+
+        extracted_data = []
+
+        # ========== EXTRACT ANNUAL DATA (10-K) ==========
+        # Request 5 years of annual data
+        for statement_type, statement_method in [
+            ('income_statement', company.income_statement),
+            ('balance_sheet', company.balance_sheet),
+            ('cash_flow', company.cash_flow)
+        ]:
+            try:
+                # Get 5 years of annual data
+                statement = statement_method(periods=5, period='annual')
+
+                # Iterate over all items with values
+                for item in statement.iter_with_values():
+                    # Skip abstract items (headers/sections)
+                    if item.is_abstract:
+                        continue
+
+                    # Iterate over ALL periods (not just first one)
+                    if item.values:
+                        for period_label, value in item.values.items():
+                            if value is not None:
+                                try:
+                                    value_float = float(value)
+
+                                    # Parse period label to get period_end date
+                                    period_end = parse_period_label(period_label)
+
+                                    extracted_data.append({
+                                        'statement_type': statement_type,
+                                        'metric_name': item.concept,
+                                        'metric_label': item.label,
+                                        'value': value_float,
+                                        'period_label': period_label,
+                                        'period_end': period_end,
+                                        'filing_type': '10-K',
+                                    })
+                                except (ValueError, TypeError):
+                                    continue
+            except Exception as e:
+                print(f"Error extracting annual {statement_type}: {str(e)}")
+
+        # ========== EXTRACT QUARTERLY DATA (10-Q) ==========
+        # Request 20 quarters (5 years) of quarterly data
+        for statement_type, statement_method in [
+            ('income_statement', company.income_statement),
+            ('balance_sheet', company.balance_sheet),
+            ('cash_flow', company.cash_flow)
+        ]:
+            try:
+                # Get 20 quarters of quarterly data
+                statement = statement_method(periods=20, period='quarterly')
+
+                # Iterate over all items with values
+                for item in statement.iter_with_values():
+                    # Skip abstract items
+                    if item.is_abstract:
+                        continue
+
+                    # Iterate over ALL periods
+                    if item.values:
+                        for period_label, value in item.values.items():
+                            if value is not None:
+                                try:
+                                    value_float = float(value)
+
+                                    # Parse period label to get period_end date
+                                    period_end = parse_period_label(period_label)
+
+                                    extracted_data.append({
+                                        'statement_type': statement_type,
+                                        'metric_name': item.concept,
+                                        'metric_label': item.label,
+                                        'value': value_float,
+                                        'period_label': period_label,
+                                        'period_end': period_end,
+                                        'filing_type': '10-Q',
+                                    })
+                                except (ValueError, TypeError):
+                                    continue
+            except Exception as e:
+                print(f"Error extracting quarterly {statement_type}: {str(e)}")
+
+        if not extracted_data:
+            print(f"Warning: No financial data extracted for {symbol}")
+            return None
+
+        return extracted_data
+
+    except Exception as e:
+        print(f"Error extracting financials: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return None
+
+def extract_and_store_financials(symbol: str, db: Session):
+    """
+    Extract financial data from latest 10-K/10-Q filing for a given ticker symbol.
+
+    Returns a summary dict, or a dict with an "error" key when the symbol has
+    no filings or no financial data could be extracted.
+    """
+    # Check if filings exist for this symbol
+    filings_10k = db.query(Filing10K).filter_by(symbol=symbol).order_by(Filing10K.filing_date.desc()).all()
+    filings_10q = db.query(Filing10Q).filter_by(symbol=symbol).order_by(Filing10Q.filing_date.desc()).all()
+
+    if not filings_10k and not filings_10q:
+        return {"error": f"No filings found for {symbol}. Please fetch filings first using /fetch-filings/{symbol}"}
+
+    # Get company name and CIK for XBRL extraction
+    import edgar as edgar_module
+    results = edgar_module.find_company(symbol)
+
+    if not results or len(results) == 0:
+        return {"error": f"Company with symbol '{symbol}' not found"}
+
+    company = results[0]
+    company_name = company.name if hasattr(company, 'name') else str(company)
+    cik = str(company.cik) if hasattr(company, 'cik') else str(company._cik)
+
+    # Extract financial data
+    financial_data = extract_financials_from_company(symbol, company_name, cik)
+
+    if not financial_data:
+        return {"error": f"Could not extract financial data for {symbol}"}
+
+    # Validation logging
+    print(f"DEBUG: Extracted data summary for {symbol}:")
+    print(f"  - Total metrics: {len(financial_data)}")
+    if financial_data:
+        annual_count = sum(1 for d in financial_data if d['filing_type'] == '10-K')
+        quarterly_count = sum(1 for d in financial_data if d['filing_type'] == '10-Q')
+        print(f"  - Annual (10-K): {annual_count}")
+        print(f"  - Quarterly (10-Q): {quarterly_count}")
+
+        annual_periods = sorted(set(d['period_label'] for d in financial_data if d['filing_type'] == '10-K'))
+        quarterly_periods = sorted(set(d['period_label'] for d in financial_data if d['filing_type'] == '10-Q'))
+        print(f"  - Annual periods: {annual_periods}")
+        print(f"  - Quarterly periods: {quarterly_periods}")
+
+    # Store in database
+    print(f"DEBUG: Starting to store {len(financial_data)} metrics for {symbol}")
+
+    # Resolve each fiscal period label to the real period end reported by the matching
+    # filing (10-K for annual periods; 10-Q, or the 10-K for Q4, for quarterly ones)
+    fye_month = fiscal_year_end_month(filings_10k)
+    resolved_periods = {}
+    for data_point in financial_data:
+        key = (data_point['period_label'], data_point['filing_type'])
+        if key not in resolved_periods:
+            approximate_end = parse_period_label(data_point['period_label'], fye_month)
+            candidates = filings_10k if data_point['filing_type'] == '10-K' else filings_10q + filings_10k
+            filing = match_period_filing(approximate_end, candidates)
+            period_end = filing.period_of_report if filing else approximate_end
+            # Q4 has no 10-Q; it is reported by (and dated to) the fiscal year's 10-K
+            source_type = '10-K' if isinstance(filing, Filing10K) else data_point['filing_type']
+            resolved_periods[key] = (period_end, filing, source_type)
+        data_point['period_end'], data_point['filing'], data_point['source_type'] = resolved_periods[key]
+
+    newest_filing = {
+        '10-K': filings_10k[0] if filings_10k else None,
+        '10-Q': filings_10q[0] if filings_10q else None,
+    }
+
+    # Latest stored version per series and every stored version key, so unchanged
+    # values are skipped up front and all new rows go in as one transaction
+    latest_versions = {}
+    existing_keys = set()
+    for filing_type, statement_type, metric_name, period_end, filing_date, value in db.query(
+        FinancialData.filing_type,
+        FinancialData.statement_type,
+        FinancialData.metric_name,
+        FinancialData.period_end,
+        FinancialData.filing_date,
+        FinancialData.value
+    ).filter(FinancialData.symbol == symbol).order_by(FinancialData.filing_date):
+        latest_versions[(filing_type, statement_type, metric_name, period_end)] = (filing_date, value)
+        existing_keys.add((filing_type, filing_date, statement_type, metric_name, period_end))
+
+    metrics_added = 0
+    restatements = 0
+    added_rows = []
+    for data_point in financial_data:
+        period_end = data_point['period_end']
+        filing_type = data_point['filing_type']
+        series = (filing_type, data_point['statement_type'], data_point['metric_name'], period_end)
+        latest = latest_versions.get(series)
+
+        source_type = data_point['source_type']
+
+        if latest is None:
+            # First version: attribute the value to the filing that reported the period,
+            # else the most recent filing of this type
+            filing = data_point['filing'] or newest_filing[source_type]
+        elif latest[1] is not None and math.isclose(latest[1], data_point['value'], rel_tol=1e-9):
+            # Expected behavior - value unchanged since the last stored version
+            print(f"DEBUG: Skipping duplicate metric: {data_point['metric_name']} for period {period_end}")
+            continue
+        else:
+            # Restatement: the value changed, so it comes from the newest filing of this type
+            filing = newest_filing[source_type]
+            if filing and filing.filing_date <= latest[0]:
+                print(f"WARNING: {data_point['metric_name']} for period {period_end} changed without a newer {source_type}, keeping stored version")
+                continue
+
+        # A value can't be known before its period ends; dating it earlier would leak it into as_of reads
+        if not filing or filing.filing_date < period_end:
+            print(f"WARNING: No filing found for {filing_type} period {period_end}, skipping metric {data_point['metric_name']}")
+            continue
+
+        key = (filing_type, filing.filing_date, data_point['statement_type'], data_point['metric_name'], period_end)
+        if key in existing_keys:
+            print(f"DEBUG: Skipping duplicate metric: {data_point['metric_name']} for period {period_end}")
+            continue
+        existing_keys.add(key)
+
+        extracted_date = datetime.now()
+        db.add(FinancialData(
+            symbol=symbol,
+            filing_type=filing_type,
+            filing_date=filing.filing_date,
+            period_end=period_end,
+            period_start=None,
+            statement_type=data_point['statement_type'],
+            metric_name=data_point['metric_name'],
+            metric_label=data_point['metric_label'],
+            value=data_point['value'],
+            unit="USD",
+            extracted_date=extracted_date
+        ))
+        added_rows.append((filing_type, period_end, extracted_date))
+        if latest is not None:
+            restatements += 1
+        latest_versions[series] = (filing.filing_date, data_point['value'])
+        metrics_added += 1
+
+    try:
+        coverage = coverage_service.add_financial_rows(symbol, db, coverage_service.summarize_financial_rows(added_rows))
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    total_metrics = coverage.financial_rows_10k + coverage.financial_rows_10q
+    print(f"DEBUG: Stored {metrics_added} metrics, total in DB: {total_metrics}")
+
+    return {
+        "symbol": symbol,
+        "company_name": company_name,
+        "metrics_added": metrics_added,
+        "restatements": restatements,
+        "total_metrics": total_metrics,
+        "statements_extracted": ["income_statement", "balance_sheet", "cash_flow"]
+    }
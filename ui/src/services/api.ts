@@ -23,6 +23,9 @@ class ApiService {
   ): Promise<ApiResponse<T>> {
     try {
       const response = await fetch(url, {
+        // Send the API's cookies cross-origin; the backend uses one to keep a
+        // client's reads on the primary database right after it writes
+        credentials: "include",
         headers: {
           "Content-Type": "application/json",
           ...options?.headers,